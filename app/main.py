@@ -1,12 +1,38 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from typing import List, Dict, Any
+import asyncio
 import re
 
+import orjson
+
 app = FastAPI(title="SmartForm Parser API with Page-Window Structure")
 
+# --- Precompiled Patterns ---
+FROM_RE = re.compile(r"\bFROM\s+([A-Za-z0-9_./]+)", re.IGNORECASE)
+WA_RE = re.compile(r"\b([A-Za-z0-9_]+)-([A-Za-z0-9_]+)\b")
+
+# ELEM_NAME -> branch of the parser loop (0 = no element-specific handling):
+# 1 NODETYPE, 2 INAME, 3 caption names, 4 TYPENAME, 5 item, 6 TDLINE,
+# 7 STYLE_NAME
+ELEM_DISPATCH = {
+    "NODETYPE": 1,
+    "INAME": 2,
+    "CAPTION": 3,
+    "FORMNAME": 3,
+    "NAME": 3,
+    "TYPENAME": 4,
+    "item": 5,
+    "TDLINE": 6,
+    "STYLE_NAME": 7,
+}
+
+# Structural node prefixes -> window list they are collected into
+STRUCT_PREFIXES = {"%ROW": "rows", "%CELL": "cells", "%TEXT": "texts"}
 
-# --- Request Model ---
+
+# --- Request Model (documents the expected row shape) ---
 class SmartformRow(BaseModel):
     ID: int
     PARENT_ID: int
@@ -19,7 +45,45 @@ class SmartformRow(BaseModel):
     TEXT_PAYLOAD: str
 
 
+# Validates a whole request body in one pydantic-core call
+ROWS_ADAPTER = TypeAdapter(List[SmartformRow])
+
+# OpenAPI request body for the routes that read the raw body themselves.
+# SmartformRow is not registered under components, so its definition is
+# inlined in place of the "#/$defs/SmartformRow" reference.
+ROWS_SCHEMA = ROWS_ADAPTER.json_schema()
+ROWS_SCHEMA["items"] = ROWS_SCHEMA.pop("$defs")["SmartformRow"]
+ROWS_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ROWS_SCHEMA}},
+    }
+}
+
+
 # --- Parser Logic ---
+def strip_abap_comments(text: str) -> str:
+    """Drop ABAP comments and blank lines from a code block.
+
+    Lines starting with "*" are full-line comments and everything after a
+    '"' is an inline comment; the remaining lines are stripped.
+    """
+    lines = map(str.strip, text.splitlines())
+    if '"' not in text and "*" not in text:  # nothing to strip but blanks
+        return "\n".join(filter(None, lines))
+    cleaned_lines = []
+    append = cleaned_lines.append
+    for line in lines:
+        if not line or line[0] == "*":  # blank or full-line comment
+            continue
+        if '"' in line:  # inline comment
+            line = line.partition('"')[0].rstrip()
+            if not line:
+                continue
+        append(line)
+    return "\n".join(cleaned_lines)
+
+
 def parse_smartform(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
     pages = []
     current_page = None
@@ -31,108 +95,117 @@ def parse_smartform(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
     last_page_name = None
     code_buffer = [] 
     capture_test_block = False
+    find_tables = FROM_RE.findall
+    find_fields = WA_RE.findall
+    dispatch = ELEM_DISPATCH.get
+    # Bound methods of the open window's collectors (None while no window)
+    add_caption = add_table = add_field = append_text = None
 
+    # Column-wise views of the rows; TEXT_PAYLOAD is stripped once here
+    elems = [r.get("ELEM_NAME", "") for r in rows]
+    texts = [(r.get("TEXT_PAYLOAD", "") or "").strip() for r in rows]
 
-    for row in rows:
-        elem = row.get("ELEM_NAME", "")
-        text = (row.get("TEXT_PAYLOAD", "") or "").strip()
-        node = row.get("NODE_TYPE", "")
+    for i in range(len(rows)):
+        elem = elems[i]
+        text = texts[i]
 
-        # --- Detect Page ---
-        if elem == "NODETYPE" and text == "PA":
-            capture_page = True
-            continue
+        code = dispatch(elem, 0)
 
-        if capture_page and elem == "INAME":
-            clean_name = text.lstrip("%")   # <-- remove leading %
-            if clean_name != last_page_name:  # prevent duplicate page entries
-                current_page = {"page_name": clean_name, "windows": []}
-                pages.append(current_page)
-                last_page_name = text
-            current_window = None
-            capture_page = False
-            continue
+        if code == 1:  # NODETYPE
+            # --- Detect Page ---
+            if text == "PA":
+                capture_page = True
+                continue
+            # --- Detect Window Marker ---
+            if text == "WI":
+                capture_window = True
+                continue
 
-        # --- Detect Window Marker ---
-        if elem == "NODETYPE" and text == "WI":
-            capture_window = True
-            continue
+        elif code == 2:  # INAME
+            if capture_page:
+                clean_name = text.lstrip("%")   # <-- remove leading %
+                if clean_name != last_page_name:  # prevent duplicate page entries
+                    current_page = {"page_name": clean_name, "windows": []}
+                    pages.append(current_page)
+                    last_page_name = text
+                current_window = None
+                add_caption = add_table = add_field = append_text = None
+                capture_page = False
+                continue
 
-        if capture_window and elem == "INAME":
-            clean_name = text.lstrip("%")   # <-- remove leading %
-            current_window = {
-                "window_name": clean_name,
-                "rows": [],
-                "cells": [],
-                "texts": [],
-                "code": [],
-                "captions": [],
-                "fields": [],
-                "tables": [],
-                "_captions_set": set(),
-                "_fields_set": set(),
-                "_tables_set": set(),
-            }
-            if current_page:
-                current_page["windows"].append(current_window)
-            capture_window = False
-            continue
+            if capture_window:
+                clean_name = text.lstrip("%")   # <-- remove leading %
+                current_window = {
+                    "window_name": clean_name,
+                    "rows": [],
+                    "cells": [],
+                    "texts": [],
+                    "code": [],
+                    "captions": [],
+                    "fields": [],
+                    "tables": [],
+                    "_captions_set": set(),
+                    "_fields_set": set(),
+                    "_tables_set": set(),
+                }
+                if current_page:
+                    current_page["windows"].append(current_window)
+                add_caption = current_window["_captions_set"].add
+                add_table = current_window["_tables_set"].add
+                add_field = current_window["_fields_set"].add
+                append_text = current_window["texts"].append
+                capture_window = False
+                continue
 
-        # --- NEW: Detect start of TEST block ---
-        if elem == "INAME" and text.startswith("%TEXT"):
-            capture_test_block = True
-            continue
+            # --- NEW: Detect start of TEST block ---
+            if text.startswith("%TEXT"):
+                capture_test_block = True
+                continue
 
-        # --- Stop collecting when STYLE_NAME appears ---
-        if capture_test_block and elem == "STYLE_NAME":
-            capture_test_block = False
-            continue
+        elif code == 7:  # STYLE_NAME
+            # --- Stop collecting when STYLE_NAME appears ---
+            if capture_test_block:
+                capture_test_block = False
+                continue
 
-        # --- Collect TDLINE lines if inside TEST block ---
-        if capture_test_block and elem == "TDLINE" and text:
-            if current_window:
-                current_window["texts"].append(text)
-            continue
+        elif code == 6:  # TDLINE
+            # --- Collect TDLINE lines if inside TEST block ---
+            if capture_test_block and text:
+                if append_text is not None:
+                    append_text(text)
+                continue
 
         # --- Classify & extract inside current window ---
         if current_window and not capture_test_block:
             # Captions / Names
-            if elem in ["CAPTION", "FORMNAME", "NAME", "TYPENAME"] and text:
-                current_window["_captions_set"].add(f"{elem}:{text}")
-
-            # Detect tables from SQL
-            select_tables = re.findall(r"\bFROM\s+([A-Za-z0-9_./]+)", text, re.IGNORECASE)
-            for t in select_tables:
-                current_window["_tables_set"].add(t.upper())
-
-            # Workarea fields
-            workarea_fields = re.findall(r"\b([A-Za-z0-9_]+)-([A-Za-z0-9_]+)\b", text)
-            for wa, field in workarea_fields:
-                current_window["_fields_set"].add(f"{wa.upper()}-{field.upper()}")
-
-            # Tables from TYPE references
-            if elem == "TYPENAME" and ("T" in text or "TAB" in text.upper()):
-                current_window["_tables_set"].add(text)
-
-            # Structural classification
-            if text.startswith("%ROW"):
-                current_window["rows"].append(text)
-            elif text.startswith("%CELL"):
-                current_window["cells"].append(text)
-            elif text.startswith("%TEXT"):
-                current_window["texts"].append(text)
-            elif elem == "item" and text:  # only ELEM_NAME = item goes into code
-                cleaned_lines = []
-                for line in text.splitlines():
-                    line = line.strip()
-                    if line.startswith("*"):  # full-line comment
-                        continue
-                    if '"' in line:  # inline comment
-                        line = line.split('"', 1)[0].rstrip()
-                    if line:  # only keep non-empty code lines
-                        cleaned_lines.append(line)
-                if cleaned_lines:
-                    code_buffer.append("\n".join(cleaned_lines))
+            if 3 <= code <= 4 and text:
+                add_caption(f"{elem}:{text}")
+                # Tables from TYPE references
+                if code == 4 and ("T" in text or "TAB" in text.upper()):
+                    add_table(text)
+
+            # Detect tables from SQL (skip the scan unless "from" is present)
+            if text and "from" in text.lower():
+                select_tables = find_tables(text)
+                for t in select_tables:
+                    add_table(t.upper())
+
+            # Workarea fields (a "-" is required for any match)
+            if "-" in text:
+                workarea_fields = find_fields(text)
+                for wa, field in workarea_fields:
+                    add_field(f"{wa.upper()}-{field.upper()}")
+
+            # Structural classification (only "%"-prefixed names qualify)
+            target = None
+            if text[:1] == "%":
+                target = STRUCT_PREFIXES.get(text[:4]) or STRUCT_PREFIXES.get(text[:5])
+            if target is not None:
+                current_window[target].append(text)
+            elif code == 5 and text:  # only ELEM_NAME = item goes into code
+                cleaned = strip_abap_comments(text)
+                if cleaned:
+                    code_buffer.append(cleaned)
                 # code_buffer.append(text)
             else:
                 if code_buffer:  # flush when ITEM block ends
@@ -153,10 +226,88 @@ def parse_smartform(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 
 
 # --- API Endpoint ---
-@app.post("/parse-smartform/")
-async def parse_smartform_api(rows: List[SmartformRow]):
+def find_row_errors(rows: Any) -> List[Dict[str, Any]]:
+    """Check the row fields parse_smartform reads, in FastAPI's error shape.
+
+    The body must be an array of objects whose ELEM_NAME and TEXT_PAYLOAD,
+    when present, are strings or null.
+    """
+    if not isinstance(rows, list):
+        return [{
+            "type": "list_type",
+            "loc": ("body",),
+            "msg": "Input should be a valid list",
+            "input": rows,
+        }]
+    errors = []
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({
+                "type": "dict_type",
+                "loc": ("body", i),
+                "msg": "Input should be a valid dictionary",
+                "input": row,
+            })
+            continue
+        for key in ("ELEM_NAME", "TEXT_PAYLOAD"):
+            value = row.get(key)
+            if value is not None and not isinstance(value, str):
+                errors.append({
+                    "type": "string_type",
+                    "loc": ("body", i, key),
+                    "msg": "Input should be a valid string",
+                    "input": value,
+                })
+    return errors
+
+
+def find_schema_errors(rows: Any) -> List[Dict[str, Any]]:
+    """Check the body against SmartformRow, in FastAPI's error shape."""
     try:
-        parsed = parse_smartform([row.dict() for row in rows])
-        return parsed
+        ROWS_ADAPTER.validate_python(rows)
+    except ValidationError as e:
+        # Match the loc shape of FastAPI's own body validation errors
+        return [{**err, "loc": ("body", *err["loc"])} for err in e.errors()]
+    return []
+
+
+def parse_body(body: bytes, find_errors) -> bytes:
+    """Decode, check, parse and re-encode one request body.
+
+    All of it is CPU-bound, so the endpoints run this in a worker thread
+    to keep the event loop serving other requests.
+    """
+    try:
+        rows = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    errors = find_errors(rows)
+    if errors:
+        raise RequestValidationError(errors)
+    try:
+        parsed = parse_smartform(rows)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return orjson.dumps(parsed)
+
+
+# The body is decoded straight from bytes with orjson and never goes through
+# pydantic; only the few keys parse_smartform reads are type-checked.
+# Callers that want full schema checking can use /parse-smartform/validated.
+@app.post("/parse-smartform/", response_model=None, openapi_extra=ROWS_OPENAPI)
+async def parse_smartform_api(request: Request):
+    body = await request.body()
+    content = await asyncio.to_thread(parse_body, body, find_row_errors)
+    return Response(content, media_type="application/json")
+
+
+# Same parser behind a schema check against SmartformRow. The validated
+# models are discarded and the decoded dicts are parsed as-is, so there is
+# no model_dump round-trip.
+@app.post(
+    "/parse-smartform/validated", response_model=None, openapi_extra=ROWS_OPENAPI
+)
+async def parse_smartform_validated_api(request: Request):
+    body = await request.body()
+    content = await asyncio.to_thread(parse_body, body, find_schema_errors)
+    return Response(content, media_type="application/json")
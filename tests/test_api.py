@@ -0,0 +1,90 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def make_row(elem, text):
+    return {
+        "ID": 1,
+        "PARENT_ID": 0,
+        "DEPTH": 1,
+        "PATH": "/",
+        "ELEM_NAME": elem,
+        "ELEM_NS": "",
+        "NODE_TYPE": "element",
+        "ATTRIBUTES": [],
+        "TEXT_PAYLOAD": text,
+    }
+
+
+FORM = [
+    make_row("NODETYPE", "PA"),
+    make_row("INAME", "%PAGE1"),
+    make_row("NODETYPE", "WI"),
+    make_row("INAME", "%MAIN"),
+    make_row("item", "SELECT * FROM mara WHERE matnr = ls_x-matnr."),
+]
+
+
+def test_validated_endpoint_parses_form():
+    response = client.post("/parse-smartform/validated", json=FORM)
+    assert response.status_code == 200
+    window = response.json()["pages"][0]["windows"][0]
+    assert window["tables"] == ["MARA"]
+    assert window["fields"] == ["LS_X-MATNR"]
+
+
+def test_validated_endpoint_reports_body_locs():
+    response = client.post("/parse-smartform/validated", json=[{"ID": "x"}])
+    assert response.status_code == 422
+    locs = [err["loc"] for err in response.json()["detail"]]
+    assert ["body", 0, "ID"] in locs
+
+
+def test_raw_endpoint_parses_form():
+    response = client.post("/parse-smartform/", json=FORM)
+    assert response.status_code == 200
+    assert response.json() == client.post(
+        "/parse-smartform/validated", json=FORM
+    ).json()
+
+
+def test_raw_endpoint_rejects_malformed_rows():
+    response = client.post("/parse-smartform/", json=[1, 2])
+    assert response.status_code == 422
+    assert [err["loc"] for err in response.json()["detail"]] == [
+        ["body", 0],
+        ["body", 1],
+    ]
+
+    response = client.post(
+        "/parse-smartform/",
+        json=[{"ELEM_NAME": 5, "TEXT_PAYLOAD": "x"},
+              {"ELEM_NAME": "item", "TEXT_PAYLOAD": 7}],
+    )
+    assert response.status_code == 422
+    assert [err["loc"] for err in response.json()["detail"]] == [
+        ["body", 0, "ELEM_NAME"],
+        ["body", 1, "TEXT_PAYLOAD"],
+    ]
+
+
+def test_endpoints_reject_bad_bodies_alike():
+    for path in ("/parse-smartform/", "/parse-smartform/validated"):
+        assert client.post(path, content=b"{nope").status_code == 400
+        for body in (b"null", b'{"rows": []}'):
+            response = client.post(path, content=body)
+            assert response.status_code == 422
+            assert response.json()["detail"][0]["loc"] == ["body"]
+
+
+def test_openapi_documents_row_body():
+    paths = client.get("/openapi.json").json()["paths"]
+    for path in ("/parse-smartform/", "/parse-smartform/validated"):
+        body = paths[path]["post"]["requestBody"]
+        schema = body["content"]["application/json"]["schema"]
+        assert body["required"] is True
+        assert schema["type"] == "array"
+        assert "TEXT_PAYLOAD" in schema["items"]["properties"]
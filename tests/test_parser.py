@@ -0,0 +1,164 @@
+import random
+import re
+
+import pytest
+
+from app.main import parse_smartform, strip_abap_comments
+
+# The original extraction: two independent scans over each payload
+BASELINE_FROM_RE = re.compile(r"\bFROM\s+([A-Za-z0-9_./]+)", re.IGNORECASE)
+BASELINE_WA_RE = re.compile(r"\b([A-Za-z0-9_]+)-([A-Za-z0-9_]+)\b")
+
+
+def baseline_tokens(payloads):
+    tables, fields = set(), set()
+    for text in payloads:
+        text = text.strip()
+        for t in BASELINE_FROM_RE.findall(text):
+            tables.add(t.upper())
+        for wa, field in BASELINE_WA_RE.findall(text):
+            fields.add(f"{wa.upper()}-{field.upper()}")
+    return sorted(tables), sorted(fields)
+
+
+def baseline_strip(text):
+    cleaned_lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("*"):
+            continue
+        if '"' in line:
+            line = line.split('"', 1)[0].rstrip()
+        if line:
+            cleaned_lines.append(line)
+    return "\n".join(cleaned_lines)
+
+
+def window_rows(payloads):
+    rows = [
+        {"ELEM_NAME": "NODETYPE", "TEXT_PAYLOAD": "PA"},
+        {"ELEM_NAME": "INAME", "TEXT_PAYLOAD": "%PAGE1"},
+        {"ELEM_NAME": "NODETYPE", "TEXT_PAYLOAD": "WI"},
+        {"ELEM_NAME": "INAME", "TEXT_PAYLOAD": "%MAIN"},
+    ]
+    rows += [{"ELEM_NAME": "item", "TEXT_PAYLOAD": p} for p in payloads]
+    return rows
+
+
+def extracted(payloads):
+    win = parse_smartform(window_rows(payloads))["pages"][0]["windows"][0]
+    return win["tables"], win["fields"]
+
+
+@pytest.mark.parametrize(
+    "payload, tables, fields",
+    [
+        ("ls-from mara", ["MARA"], ["LS-FROM"]),
+        ("wa-FROM tab WHERE x-y = 1", ["TAB"], ["WA-FROM", "X-Y"]),
+        ("FROM from T ls-x", ["FROM"], ["LS-X"]),
+        ("from FROM x_y-z", ["FROM"], ["X_Y-Z"]),
+        ("SELECT * FROM ls_x-tabname", ["LS_X"], ["LS_X-TABNAME"]),
+    ],
+)
+def test_table_and_field_scans_are_independent(payload, tables, fields):
+    assert extracted([payload]) == (tables, fields)
+
+
+def test_matches_two_scan_baseline_on_random_payloads():
+    rng = random.Random(0)
+    words = ["FROM", "from", "From", "ls", "wa", "x_y", "mara", "T", "tab",
+             "a/b", "-", "-", " ", "  ", "\n", ".", "Käse", "Größe"]
+    for _ in range(500):
+        payloads = [
+            "".join(rng.choice(words) for _ in range(rng.randint(1, 12)))
+            for _ in range(rng.randint(1, 5))
+        ]
+        assert extracted(payloads) == baseline_tokens(payloads), payloads
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("  DATA x.\n\n\tWRITE x.  \r\n", "DATA x.\nWRITE x."),  # shortcut
+        ("   * comment\nWRITE x.", "WRITE x."),
+        ("  \" comment\nWRITE x. \" trailing", "WRITE x."),
+        ("SELECT * FROM mara.", "SELECT * FROM mara."),
+    ],
+)
+def test_strip_abap_comments(text, expected):
+    assert strip_abap_comments(text) == expected
+
+
+def test_strip_matches_per_line_baseline_on_random_text():
+    rng = random.Random(0)
+    chars = ["a", "b", ".", "*", '"', " ", "  ", "\t", "\n", "\r\n", "\x0c"]
+    for _ in range(2000):
+        text = "".join(rng.choice(chars) for _ in range(rng.randint(0, 16)))
+        assert strip_abap_comments(text) == baseline_strip(text), text
+
+
+def test_page_window_state_machine():
+    form = [
+        # A window before any page is not attached anywhere, but its
+        # pending code block carries over to the next window
+        ("NODETYPE", "WI"), ("INAME", "%ORPHAN"),
+        ("item", "lv_lost = ls_lost-a."),
+        ("NODETYPE", "PA"), ("INAME", "%FIRST"),
+        ("NODETYPE", "WI"), ("INAME", "%MAIN"),
+        ("INAME", "%ROW1"), ("INAME", "%CELL1"), ("TEXTNAME", "%TEXT_REF"),
+        # %TEXT INAME opens a TEXT block: TDLINEs are collected, other rows
+        # are ignored until STYLE_NAME closes it
+        ("INAME", "%TEXT1"), ("TDLINE", "Hello"), ("TDLINE", ""),
+        ("item", "ignored = ls_skip-x."), ("TDLINE", "World"),
+        ("STYLE_NAME", "ZSTYLE"),
+        ("item", "SELECT * FROM mara INTO ls_mara."),
+        ("item", "* comment\nls_mara-matnr = 1. \" inline"),
+        ("CAPTION", "Title"),  # non-item row flushes the code block
+        ("TYPENAME", "ZTAB_TYPE"),
+        # A repeated (unprefixed) page name does not open a second page
+        ("NODETYPE", "PA"), ("INAME", "SECOND"),
+        ("NODETYPE", "PA"), ("INAME", "SECOND"),
+        ("NODETYPE", "WI"), ("INAME", "%SIDE"),
+        ("item", "WRITE gs_side-name."),
+        ("item", "CLEAR gs_side."),  # flushed at end of input
+    ]
+    rows = [{"ELEM_NAME": e, "TEXT_PAYLOAD": t} for e, t in form]
+
+    assert parse_smartform(rows) == {
+        "pages": [
+            {
+                "page_name": "FIRST",
+                "windows": [
+                    {
+                        "window_name": "MAIN",
+                        "rows": ["%ROW1"],
+                        "cells": ["%CELL1"],
+                        "texts": ["%TEXT_REF", "Hello", "World"],
+                        "code": [
+                            "lv_lost = ls_lost-a.\n"
+                            "SELECT * FROM mara INTO ls_mara.\n"
+                            "ls_mara-matnr = 1."
+                        ],
+                        "captions": [],
+                        "fields": ["LS_MARA-MATNR"],
+                        "tables": ["MARA", "ZTAB_TYPE"],
+                    }
+                ],
+            },
+            {
+                "page_name": "SECOND",
+                "windows": [
+                    {
+                        "window_name": "SIDE",
+                        "rows": [],
+                        "cells": [],
+                        "texts": [],
+                        "code": ["WRITE gs_side-name.\nCLEAR gs_side."],
+                        "captions": [],
+                        "fields": ["GS_SIDE-NAME"],
+                        "tables": [],
+                    }
+                ],
+            },
+        ]
+    }